@@ -5,4 +5,8 @@ Created on Thu Apr 11 08:16:32 2019
 @author: pce
 """
 from . import closepackstack
-__all__ = ['closepackstack']
\ No newline at end of file
+from .closepackstack import (Lattice, Site, Structure, LayerArrays,
+                             build, build_many, write_cif, write_str)
+
+__all__ = ['closepackstack', 'Lattice', 'Site', 'Structure', 'LayerArrays',
+           'build', 'build_many', 'write_cif', 'write_str']
\ No newline at end of file
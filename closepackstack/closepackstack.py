@@ -7,19 +7,30 @@ Created on Fri Mar 29 08:09:05 2019
 """
 
 import numpy as np
+from io import StringIO
 # from asteval import Interpreter
-from collections import OrderedDict, Iterable
-from copy import deepcopy
+from collections import OrderedDict
+from collections.abc import Iterable
+from itertools import cycle
+from os.path import abspath
+try:  # imported as part of the closepackstack package
+    from .templates import template_cif, template_str
+except ImportError:  # imported as a module from this directory
+    from templates import template_cif, template_str
 
 #%% class containers
 class Lattice(object):
     """ simple representation of a lattice """
+    __slots__ = ('_a', '_b', '_c', '_al', '_be', '_ga', '_list', '_abc', '_angles', '_hash')
+
     def __repr__(self):
         return 'Lattice <a={}, b={}, c={}, alpha={}, beta={}, gamma={} >'.format(*self.list)
 
     def __hash__(self):
-        """ overload built in hash """
-        return hash((self.a, self.b, self.c, self.al, self.be, self.ga))
+        """ overload built in hash (cached until a lattice parameter is set) """
+        if self._hash is None:
+            self._hash = hash((self.a, self.b, self.c, self.al, self.be, self.ga))
+        return self._hash
 
     def __eq__(self, other):
         """ overload built-in equal """
@@ -45,20 +56,38 @@ class Lattice(object):
 
     def copy(self):
         """ return new instance of self """
-        return deepcopy(self)
+        return Lattice(self.a, self.b, self.c, self.al, self.be, self.ga)
+
+    def _reset(self):
+        """ discard cached arrays and hash after a lattice parameter is set """
+        self._list = None
+        self._hash = None
+
+    def _cache(self):
+        """ cache read-only arrays of the lattice parameters """
+        self._list = np.array((self.a, self.b, self.c, self.al, self.be, self.ga), dtype=float)
+        self._list.flags.writeable = False
+        self._abc = self._list[:3]
+        self._angles = self._list[3:]
 
     # properties
     @property
     def abc(self):
-        return np.array((self.a, self.b, self.c), dtype=float)
+        if self._list is None:
+            self._cache()
+        return self._abc
 
     @property
     def angles(self):
-        return np.array((self.al, self.be, self.ga), dtype=float)
+        if self._list is None:
+            self._cache()
+        return self._angles
 
     @property
     def list(self):
-        return np.array((self.a, self.b, self.c, self.al, self.be, self.ga), dtype=float)
+        if self._list is None:
+            self._cache()
+        return self._list
 
     @property
     def a(self):
@@ -87,194 +116,212 @@ class Lattice(object):
     # set methods
     @abc.setter
     def abc(self, listvalues):
-        self.abc = listvalues
+        self.a, self.b, self.c = listvalues[:]
 
     @angles.setter
     def angles(self, listvalues):
-        self.angles = listvalues
+        self.al, self.be, self.ga = listvalues[:]
 
     @a.setter
     def a(self, value):
         self._a = value
+        self._reset()
 
     @b.setter
     def b(self, value):
         self._b = value
+        self._reset()
 
     @c.setter
     def c(self, value):
         self._c = value
+        self._reset()
 
     @al.setter
     def al(self, value):
         self._al = value
+        self._reset()
 
     @be.setter
     def be(self, value):
         self._be = value
+        self._reset()
 
     @ga.setter
     def ga(self, value):
         self._ga = value
+        self._reset()
 
     # Lattice
 
 
-class Site(Lattice):
-    """ Simple representation of a site, inheriting an associated lattice """
+def _latt_property(name):
+    """ property reading and writing attribute name through to the shared Lattice instance """
+    def fget(self):
+        return getattr(self._latt, name)
+
+    def fset(self, value):
+        setattr(self._latt, name, value)
+    return property(fget, fset)
+
+
+class Site(object):
+    """ Simple representation of a site, referencing a shared lattice """
+    __slots__ = ('specie', 'name', 'occ', 'biso', 'fx', 'fy', 'fz', '_latt')
+
     def __repr__(self):
         return 'Site< {}  occ={}  fx={}, fy={}, fz={} >'.format(*[str(s) for s in (self.name, self.occ, self.fx, self.fy, self.fz)])
 
     def __init__(self, specie, occupancy, fx, fy, fz, Biso, lattice):
-        # Site inherits Lattice attributes
+        # Site reads Lattice attributes through the shared instance
         self.latt = lattice
-        super(Site, self).__init__(*self.latt.list)
         # Decorate with atoms
         self.name = specie  # customizable label
         self.specie = specie  # element symbol
         self.occ = occupancy
         self.biso = Biso
-        # fractional coords
+        # fractional coords (absolute coords are derived from the lattice)
         self.fx = fx
         self.fy = fy
         self.fz = fz
-        # absolute coords
-        self.x = fx * self.a
-        self.y = fy * self.b
-        self.z = fz * self.c
         return
 
     def copy(self):
-        """ return new instance of self """
-        return deepcopy(self)
+        """ return new instance of self (sharing the Lattice instance) """
+        rv = Site(self.specie, self.occ, self.fx, self.fy, self.fz, self.biso, self.latt)
+        rv.name = self.name
+        return rv
 
 
     # properties
     @property
     def x(self):
-        return float(self._x)
+        return self.fx * self.a
 
     @property
     def y(self):
-        return float(self._y)
+        return self.fy * self.b
 
     @property
     def z(self):
-        return float(self._z)
+        return self.fz * self.c
 
     @property
     def xyz(self):
-        return np.array((self._x, self._y, self._z))
-
-    @property
-    def fx(self):
-        return float(self._fx)
-
-    @property
-    def fy(self):
-        return float(self._fy)
-
-    @property
-    def fz(self):
-        return float(self._fz)
+        return np.array((self.x, self.y, self.z), dtype=float)
 
     @property
     def fxyz(self):
-        return  np.array((self._fx, self._fy, self._fz))
-    
-    @property
-    def biso(self):
-        return float(self._biso)
+        return np.array((self.fx, self.fy, self.fz), dtype=float)
 
     # set methods
     @x.setter
     def x(self, value):
-        self._x = value
-        self._fx = self._x / self.a
+        self.fx = value / self.a
 
     @y.setter
     def y(self, value):
-        self._y = value
-        self._fy = self.y / self.b
+        self.fy = value / self.b
 
     @z.setter
     def z(self, value):
-        self._z = value
-        self._fz = self.z / self.c
+        self.fz = value / self.c
 
     @xyz.setter
     def xyz(self, listvalues):
         self.x, self.y, self.z = listvalues[:]
 
-    @fx.setter
-    def fx(self, value):
-        self._fx = value
-        self._x = self._fx * self.a
-
-    @fy.setter
-    def fy(self, value):
-        self._fy = value
-        self._y = self._fy * self.b
-
-    @fz.setter
-    def fz(self, value):
-        self._fz = value
-        self._z = self._fz * self.c
-
     @fxyz.setter
     def fxyz(self, listvalues):
         self.fx, self.fy, self.fz = listvalues[:]
-    
-    @biso.setter
-    def biso(self, biso):
-        self._biso = biso
-
-    # superceed lattice setters with update methods
-    def setlatt(self, listvalues):
-        """ listvalues (len==6) """
-        self.a, self.b, self.c, self.al, self.be, self.ga = listvalues[:]
 
+    # lattice parameters are read through the shared Lattice instance
     @property
     def latt(self):
         return self._latt
 
     @latt.setter
     def latt(self, lattice):
-        if not hasattr(self, '_latt'): # instantiate
-            self._latt = lattice
-        else:  # if self._latt != lattice:  # override
-            # print('setting Site.latt' )
-            self._latt = lattice
-            self.setlatt(self._latt.list)
-
-    @Lattice.a.setter
-    def a(self, value):
-        self._a = value           # set
-        self.latt.a = value
-        if hasattr(self, '_x'):    # override
-            self.fx = self.x / value
-
-    @Lattice.b.setter
-    def b(self, value):
-        self._b = value          # set
-        self.latt.b = value
-        if hasattr(self, '_y'):   # override
-            self.fy = self.y / value
+        self._latt = lattice
 
-    @Lattice.c.setter
-    def c(self, value):
-        self._c = value          # set
-        self.latt.c = value
-        # print( value )
-        if hasattr(self, '_z'):   # override
-            self.fz = self.z / value
-            # print ('setting new Site.latt.c')
-            # print (self.fz)
+    a = _latt_property('a')
+    b = _latt_property('b')
+    c = _latt_property('c')
+    al = _latt_property('al')
+    be = _latt_property('be')
+    ga = _latt_property('ga')
+    abc = _latt_property('abc')
+    angles = _latt_property('angles')
+    list = _latt_property('list')
 
     # Site
 
 
-class Structure(Lattice, Iterable):
+class LayerArrays(object):
+    """ structure-of-arrays representation of the sites in a layer """
+    def __repr__(self):
+        return 'LayerArrays< {} sites  {} >'.format(len(self), self.latt.__repr__())
+
+    def __len__(self):
+        return len(self.frac)
+
+    def __init__(self, frac, species, occ, biso, lattice, names=None):
+        """
+        Parallel arrays describing M sites in a common lattice, so that layer payloads can
+        be shifted and stacked with broadcast operations rather than per-Site attribute access.
+
+        Args:
+            - frac (np.ndarray (M, 3)) fractional coordinates
+            - species (np.ndarray (M,) object) element symbols
+            - occ (np.ndarray (M,)) site occupancies
+            - biso (np.ndarray (M,)) isotropic displacement parameters
+            - lattice (closepackedstack.Lattice instance)
+        Optional:
+            - names (np.ndarray (M,) object) site labels, defaults to species
+
+        """
+        self.frac = np.asarray(frac, dtype=float).reshape(-1, 3)
+        self.species = np.asarray(species, dtype=object)
+        self.occ = np.asarray(occ, dtype=float)
+        self.biso = np.asarray(biso, dtype=float)
+        if names is None:
+            names = self.species
+        self.names = np.array(names, dtype=object)
+        self.latt = lattice
+        return
+
+    @classmethod
+    def from_sites(cls, sites, lattice):
+        """ collect the attributes of an iterable of Site instances into parallel arrays """
+        sites = list(sites)
+        return cls(frac=[(site.fx, site.fy, site.fz) for site in sites],
+                   species=[site.specie for site in sites],
+                   occ=[site.occ for site in sites],
+                   biso=[site.biso for site in sites],
+                   lattice=lattice,
+                   names=[site.name for site in sites]
+                   )
+
+    def copy(self):
+        """ return new instance of self """
+        return LayerArrays(self.frac.copy(), self.species.copy(), self.occ.copy(), self.biso.copy(),
+                           self.latt, names=self.names)
+
+    def site(self, idx):
+        """ materialize the idx-th row as a Site instance """
+        fx, fy, fz = self.frac[idx]
+        rv = Site(self.species[idx], float(self.occ[idx]), fx, fy, fz, float(self.biso[idx]), self.latt)
+        rv.name = self.names[idx]
+        return rv
+
+    def sites(self):
+        """ materialize all rows as a list of Site instances """
+        return [self.site(idx) for idx in range(len(self))]
+
+    # LayerArrays
+
+
+class Structure(Iterable):
     """ general structure container without symmetry operations """
     def __repr__(self):
         [site.__repr__() for site in self.sites]
@@ -284,58 +331,82 @@ class Structure(Lattice, Iterable):
                 )
 
     def __iter__(self):
-        return self
+        return iter(self.sites)
 
-    def __reset__(self):
-        self.current = 0
+    def __hash__(self):
+        """ hash of the shared Lattice instance """
+        return hash(self._latt)
 
-    def __next__(self):
-        if self.current > self.high:
-            self.__reset__()
-            raise StopIteration
-        else:
-            self.current += 1
-            return self.sites[self.current - 1]
+    def __eq__(self, other):
+        """ compare the shared Lattice instance (of other, if a Structure) """
+        if isinstance(other, Structure):
+            other = other._latt
+        return self._latt.__eq__(other)
 
-    # Py2
-    next = __next__
+    def __len__(self):
+        if self._sites is None:
+            return len(self._arrays)
+        return len(self._sites)
 
-    def __init__(self, sites=None, lattice=None):
+    def __init__(self, sites=None, lattice=None, arrays=None):
         """
         A general structure container without enabled symmetry operations. The Lattice is a 
         shared attribute of both the Structure and Site instances, so that changes to the 
         Lattice influence the positions, etc. of the Sites through a common data structure.
         
-        Structure, Lattice, and Site objects have copy methods which return a deepcopy of 
-        the object. Lattice objects are hashed based on their scalar parameterization for
+        Structure, Lattice, and Site objects have copy methods which return a new instance of
+        the object (a copied Site shares its Lattice instance; a copied Structure gets a new
+        one). Lattice objects are hashed based on their scalar parameterization for
         comparison.
         
-        Changes to the Lattice instance at the Structure level are propagated to the subordinate
-        objects.
+        Lattice parameters of the Structure and its Sites are read through the shared Lattice
+        instance, so edits (e.g. Structure.c = 2.5) are seen by all of them without copying.
+        Assigning a new Lattice instance to Structure.latt rebinds the subordinate Sites.
+
+        A Structure may instead be populated from a LayerArrays instance (e.g. the output of
+        build), in which case Site instances are only materialized when Structure.sites is
+        accessed.
         
         Args:
             - sites (closepackedstack.Site instance(s))
             - lattice (closepackedstack.Lattice instance)
+        Optional:
+            - arrays (closepackedstack.LayerArrays instance) used in place of sites
 
         """
         # sites
-        if sites is None:
-            sites = []
-        self.sites = sites
+        self._sites = None
+        self._arrays = None
+        if arrays is not None:
+            self._arrays = arrays
+        else:
+            if sites is None:
+                sites = []
+            self._sites = sites
         # lattice
         self.latt = lattice
-        super(Structure, self).__init__(*self.latt.list)
-        # iter support
-        self.current = 0
-        self.lo = 0
-        self.high = len(self.sites) - 1
         return
 
     def copy(self):
-        """ return new instance of self """
-        return deepcopy(self)
+        """ return new instance of self with a copy of the Lattice instance """
+        latt = self.latt.copy()
+        if self._sites is None:
+            return Structure(arrays=self._arrays.copy(), lattice=latt)
+        return Structure(sites=[site.copy() for site in self._sites], lattice=latt)
+
+    def with_lattice(self, lattice):
+        """
+        return new array-backed instance of self with the same fractional site data in lattice
+        (self and its sites keep their own lattice). frac, species, occ and biso are shared
+        with self only if self is already array-backed; Site-backed instances are collected
+        into new arrays. names are always copied.
+        """
+        arrays = self.arrays
+        return Structure(arrays=LayerArrays(arrays.frac, arrays.species, arrays.occ, arrays.biso,
+                                            lattice, names=arrays.names),
+                         lattice=lattice)
 
-    # some class specific overrides here too (there's probably a cleaner way to mix these in)
+    # lattice parameters are read through the shared Lattice instance
     @property
     def latt(self):
         return self._latt
@@ -343,28 +414,42 @@ class Structure(Lattice, Iterable):
     @latt.setter
     def latt(self, lattice):
         self._latt = lattice
-        for site in self.sites:  # flatten lattice
+        if self._sites is None:  # sites not yet materialized
+            self._arrays.latt = self._latt
+            return
+        for site in self._sites:  # flatten lattice
             # if site.latt != self._latt:
             # print('setting Structure.latt')
             site.latt = self._latt
+
+    @property
+    def sites(self):
+        if self._sites is None:  # materialize on first access
+            self._sites = self._arrays.sites()
+            self._arrays = None
+        return self._sites
+
+    @sites.setter
+    def sites(self, sites):
+        self._sites = sites
+        self._arrays = None
+
+    @property
+    def arrays(self):
+        """ LayerArrays representation of the sites (rebuilt from Site instances if present) """
+        if self._sites is None:
+            return self._arrays
+        return LayerArrays.from_sites(self._sites, self.latt)
                 
-    @Lattice.a.setter
-    def a(self, value):
-        self._a = value           # set
-        self.latt.a = value       # why aren't these at the same pointer??
-        self.latt = self.latt     # push 
-        
-    @Lattice.b.setter
-    def b(self, value):
-        self._b = value          # set
-        self.latt.b = value
-        self.latt = self.latt
-        
-    @Lattice.c.setter
-    def c(self, value):
-        self._c = value          # set
-        self.latt.c = value
-        self.latt = self.latt
+    a = _latt_property('a')
+    b = _latt_property('b')
+    c = _latt_property('c')
+    al = _latt_property('al')
+    be = _latt_property('be')
+    ga = _latt_property('ga')
+    abc = _latt_property('abc')
+    angles = _latt_property('angles')
+    list = _latt_property('list')
 
     # Layer
 
@@ -373,25 +458,21 @@ class PeriodicCycle(Iterable):
     """
     Resets index of iterable to 0 after max index exceeded
 
+    Thin wrapper over itertools.cycle, kept for API compatibility.
+
     Reference:
         SO # 19151 - build-a-basic-python-iterator
     """
     def __init__(self, iterable):
         """ cycles over iterable infinitely from idx = 0 to idx = len(iterable) - 1 """
         self.iterable = iterable
-        self.current = 0
-        self.low = 0
-        self.high = len(iterable) - 1
+        self._cycle = cycle(list(iterable))
 
     def __iter__(self):
         return self
 
     def __next__(self): # Python 3: def __next__(self)
-        """ if self.current > self.high, self.current = self.low """
-        if self.current > self.high:
-            self.current = self.low
-        self.current += 1
-        return self.iterable[self.current - 1]
+        return next(self._cycle)
     
     next = __next__ # Python 2
 
@@ -399,7 +480,15 @@ class PeriodicCycle(Iterable):
 
 
 #%% build functionality
-def build(sequence, interlayervectors, blockperiod, Nblocks, *args, **kwargs):
+def _as_vectors(vectors, label):
+    """ (N, 3) float64 array of vectors, raising ValueError if they are not 3-vectors """
+    rv = np.atleast_2d(np.asarray(vectors, dtype=np.float64))
+    if rv.ndim != 2 or rv.shape[1] != 3:
+        raise ValueError('{} must be 3-vectors, got shape {}'.format(label, np.shape(vectors)))
+    return rv
+
+
+def build(sequence, interlayervectors, blockperiod, Nblocks, *args, pool=None, **kwargs):
     """
     build a collection of sites and a corresponding lattice based on a sequence mapping
     layers (Structure objects) and position vectors.
@@ -410,11 +499,15 @@ def build(sequence, interlayervectors, blockperiod, Nblocks, *args, **kwargs):
         - current implimentation deals with scalar lattice, so gamma != 90 will produce some problems
     
     Args:
-        - sequence (iterable)  [(Structure, FRACTIONAL_VECTOR), .... ]
+        - sequence (iterable)  [(Structure, FRACTIONAL_VECTOR), .... ] layers may also be given
+              as precomputed LayerArrays instances, vectors as 3-tuples or arrays
         - interlayervectors (list(1x3)) cycle of interlayer vectors to insert every blockperiod
               in ABSOLUTE_UNITS
         - blockperiod (int) how many single atom layers comprise a block
         - Nblocks (int) howmany block cycles to inject into a supercell
+    Optional:
+        - pool (iterable) [(Structure, FRACTIONAL_VECTOR), .... ] if given, sequence is an array
+              of integer indices into pool (e.g. a parsed sequence of symbols)
     Defaults:
         - origin (0, 0, 0) in ABSOLUTE UNITS
         
@@ -422,78 +515,135 @@ def build(sequence, interlayervectors, blockperiod, Nblocks, *args, **kwargs):
     """
     # initialize ---------------------
     if interlayervectors is None:
-        interlayervectors = [np.array((0,0,0))]
-    ss = PeriodicCycle(sequence)  # cyclable mapping of (layer, vector)
-    iv = PeriodicCycle(interlayervectors)  # cyclable set of interlayer vectors to inject (shape (N, (1,3)))
-    origin = np.array((0, 0, 0), dtype=float)  # initialize origin |  reference for column position |  modified by non-zero interlayer vectors
-    sites = []
-
-    # build sites --------------------
-    for idx in range(Nblocks * blockperiod):
-        # get layer and position
-        layer, vector = next(ss)
-        vx, vy, vz = vector.T
-        
-        print(idx, origin)
-# =============================================================================
-#         # force first layer to origin, no matter what! No choices for the user! None!
-#         if idx == 0:
-#             shift = (origin - vector) * layer.abc
-#             origin += shift
-# =============================================================================
-
-        # add sites to site list
-        for site in layer:
-            rv = site.copy()
-            # rv.xyz += (vector * layer.abc + origin)  # add in layer position + interlayer operations
-            rv.x += vx * layer.a
-            rv.y += vy * layer.b
-            rv.z += origin[-1]
-            sites.append(rv)
-
-        #  + every blockperiod insert interlayer adjustments
-        if (idx != 0) and ((idx + 1) % blockperiod == 0):  # look ahead
-            origin += next(iv)   # with memory for subsequent layers
-
-        # increase origin by layer height & do next
-        origin[-1] += (vector[-1] * layer.c)
-        
-# =============================================================================
-#     # give back the adjustment of the 0th layer
-#     origin[-1] -= shift[-1]
-# =============================================================================
-    
+        interlayervectors = [(0., 0., 0.)]
+    if pool is None:  # sequence is the mapping of (layer, vector) itself
+        pool = list(sequence)
+        sequence = np.arange(len(pool))
+    sequence = np.asarray(sequence, dtype=int)  # indices into pool, cycled over the supercell
+    ivs = _as_vectors(interlayervectors, 'interlayervectors')  # set of interlayer vectors to inject (shape (N, 3))
+    Nlayers = Nblocks * blockperiod
+    layers = {}  # index of each unique layer
+    unique = []  # LayerArrays of each unique layer, computed once
+    ids = np.zeros(len(pool), dtype=int)  # unique layer index of each pool entry
+    vecs = _as_vectors([vector for layer, vector in pool], 'sequence vectors')  # FRACTIONAL_VECTOR of each pool entry
+
+    # layer sequence -----------------
+    for idx, (layer, _) in enumerate(pool):
+        if id(layer) not in layers:
+            layers[id(layer)] = len(unique)
+            unique.append(layer if isinstance(layer, LayerArrays) else layer.arrays)
+        ids[idx] = layers[id(layer)]
+    cyc = sequence[np.arange(Nlayers) % len(sequence)]
+    layer_ids = ids[cyc]   # unique layer index of each placed layer
+    vectors = vecs[cyc]    # FRACTIONAL_VECTOR of each placed layer
+    abc = np.array([arrays.latt.abc for arrays in unique]).reshape(-1, 3)[layer_ids]
+
+    # layer origins ------------------
+    # increase origin by layer height
+    inc = np.zeros((Nlayers, 3))
+    inc[:, 2] = vectors[:, 2] * abc[:, 2]
+    #  + every blockperiod insert interlayer adjustments (look ahead, with memory for subsequent layers)
+    inject = np.arange(blockperiod - 1, Nlayers, blockperiod)
+    inject = inject[inject != 0]
+    inc[inject] += ivs[np.arange(len(inject)) % len(ivs)]  # cycle of interlayer vectors
+    # origin of each layer | reference for column position | initialized at (0, 0, 0) in ABSOLUTE UNITS
+    top = np.cumsum(inc, axis=0)
+    origin = np.concatenate((np.zeros((1, 3)), top[:-1]), axis=0)
+
+    # place layers -------------------
+    # gather rows of the unique layers into supercell order
+    counts = np.array([len(arrays) for arrays in unique], dtype=int)
+    starts = np.cumsum(counts) - counts  # first row of each unique layer
+    m = counts[layer_ids]                # number of sites in each placed layer
+    total = m.sum()                      # number of sites in the supercell
+    owner = np.repeat(np.arange(Nlayers), m)  # placed layer of each site
+    rows = np.arange(total) + np.repeat(starts[layer_ids] - (np.cumsum(m) - m), m)
+    # add in layer position + interlayer operations, in place on the final (total, 3) array
+    frac = np.empty((total, 3))
+    np.take(np.vstack([arrays.frac for arrays in unique]), rows, axis=0, out=frac)
+    frac[:, :2] += vectors[owner, :2]
+    frac *= abc[owner]
+    frac[:, 2] += origin[owner, 2]
+
     # make superlattice ----------------
     # lattice
-    scalar_lattice = layer.latt.list  # unpack lattice from last layer
-    scalar_lattice[2] = origin[-1]   # c = sum of all appended layers + vector operations
+    scalar_lattice = np.array(unique[layer_ids[-1]].latt.list)  # unpack lattice from last layer
+    scalar_lattice[2] = top[-1, 2]   # c = sum of all appended layers + vector operations
     slatt = Lattice(*scalar_lattice)
 
-    # apply periodic constraint
-    for site in sites:
-        for i, coord in enumerate(site.fxyz[:2]):
-            if abs(coord) > 1.:
-                site.fxyz[i] = coord % 1
+    # collect site arrays in fractional units of the superlattice
+    frac /= slatt.abc
+    species = np.concatenate([arrays.species for arrays in unique])[rows]
+    names = np.concatenate([arrays.names for arrays in unique])[rows]
+    occ = np.concatenate([arrays.occ for arrays in unique])[rows]
+    biso = np.concatenate([arrays.biso for arrays in unique])[rows]
+
+    # apply periodic constraint (in-plane coordinates folded into [0, 1))
+    frac[:, :2] -= np.floor(frac[:, :2])
 
     # pop sites into new lattice
-    supstr = Structure(sites=sites, lattice=slatt)
+    supstr = Structure(arrays=LayerArrays(frac, species, occ, biso, slatt, names=names),
+                       lattice=slatt)
 
     # if nothing's gone wrong, we're done
     return supstr
 
 
+def build_many(sequences, interlayervectors, blockperiod, Nblocks, *args, **kwargs):
+    """
+    build several supercells from sequences which share layers (e.g. a set of polytypes),
+    computing the LayerArrays of each unique layer once for the whole batch.
+
+    Args:
+        - sequences (iterable) [sequence, ....] each as in build
+        - interlayervectors (list(1x3)) as in build, shared by all supercells
+        - blockperiod (int) as in build, shared by all supercells
+        - Nblocks (int or iterable(int)) howmany block cycles to inject into each supercell
+    Returns:
+        - list(closepackstack.Structure) in the order of sequences
+    """
+    sequences = list(sequences)
+    if np.ndim(Nblocks) == 0:
+        Nblocks = [Nblocks] * len(sequences)
+    layers = {}  # LayerArrays of each unique layer, computed once
+    rv = []
+    for sequence, N in zip(sequences, Nblocks):
+        entries = []  # (LayerArrays, FRACTIONAL_VECTOR) of this sequence only
+        for layer, vector in sequence:
+            if id(layer) not in layers:
+                layers[id(layer)] = layer if isinstance(layer, LayerArrays) else layer.arrays
+            entries.append((layers[id(layer)], vector))
+        rv.append(build(entries, interlayervectors, blockperiod, N, *args, **kwargs))
+    return rv
+
+
 def unique_labels(Structure):
     """
     TOPAS requires unique labels for sites.
+
+    Returns:
+        - closepackstack.LayerArrays of the relabeled Structure
     """
-    for specie in set([site.specie for site in Structure.sites]):
-        l = [x for x in Structure.sites if x.specie is specie]
-        n = iter(range(1, len(l) + 1))
-        for site in [x for x in Structure.sites if x.specie is specie]:
-            site.name = specie + str(next(n))
-    return
+    arrays = Structure.arrays
+    counts = {}  # running count of each specie
+    names = []
+    for specie in arrays.species:
+        n = counts.get(specie, 0) + 1
+        counts[specie] = n
+        names.append(specie + str(n))
+    arrays.names = np.array(names, dtype=object)
+    if Structure._sites is not None:  # keep materialized sites in step
+        for site, name in zip(Structure._sites, names):
+            site.name = name
+    return arrays
     
 
+def _dump(rv, fname, ext):
+    """ write the fully formatted file contents rv to fname + ext in a single call """
+    with open(abspath(fname) + ext, 'w') as f:
+        f.write(rv)
+
+
 def write_cif(Structure, fname, debug=None):
     """
     write closepackstack.Structure to .cif file in P1 symmetry
@@ -509,16 +659,14 @@ def write_cif(Structure, fname, debug=None):
         - current Structure object has no thermal displacement attribute -> default to 1 (Biso)
     """
     # NAME, METHOD, lpa, lpb, lpc, lpal, lpbe, lpga, SG, SITE_BLOCK
-    from templates import template_cif
-    from os.path import abspath
-    
     # get unique labels
-    unique_labels(Structure)
+    arrays = unique_labels(Structure)
     
-    sites = Structure.sites
-    SITE_BLOCK = '\n'.join([' '.join([str(getattr(sites[idx], attr)) for attr in 
-                                          ('name', 'specie', 'occ', 'fx', 'fy', 'fz', 'biso')])  #  + '  1'
-                                for idx in range(len(sites))])
+    # label specie occ fx fy fz biso
+    buf = StringIO()
+    np.savetxt(buf, np.column_stack((arrays.names, arrays.species, arrays.occ, arrays.frac, arrays.biso)),
+               fmt='%s %s %.6f %.6f %.6f %.6f %.4f')
+    SITE_BLOCK = buf.getvalue().rstrip()
     
     inp = dict(NAME=fname, METHOD='clospackstack.py', SG='P1', SITE_BLOCK=SITE_BLOCK) 
     inp.update(zip(('lpa', 'lpb', 'lpc', 'lpal', 'lpbe', 'lpga'), Structure.latt.list))
@@ -527,8 +675,7 @@ def write_cif(Structure, fname, debug=None):
     if debug is not None:  # optionally return str to console for debugging
         return rv
     
-    with open(abspath(fname) + '.cif', 'w+') as f:
-        f.write(rv)
+    _dump(rv, fname, '.cif')
     
 
 def write_str(Structure, fname, debug=None):
@@ -545,18 +692,15 @@ def write_str(Structure, fname, debug=None):
     Note:
         - current Structure object has no thermal displacement attribute -> default to 1 (Biso)   
     """
-    from templates import template_str
-    from os.path import abspath
-    
     # get unique labels
-    unique_labels(Structure)
+    arrays = unique_labels(Structure)
     
     # METHOD NAME SG lpa lpb lpc lpal lpbe lpga SITE_BLOCK
-    sites = Structure.sites
     # load site x y z occ biso {}
-    SITE_BLOCK = '\n        '.join([' '.join([str(getattr(sites[idx], attr)) for attr in 
-                                          ('name', 'fx', 'fy', 'fz', 'specie', 'occ', 'biso')])   # + '  1'
-                                for idx in range(len(sites))])
+    buf = StringIO()
+    np.savetxt(buf, np.column_stack((arrays.names, arrays.frac, arrays.species, arrays.occ, arrays.biso)),
+               fmt='%s %.6f %.6f %.6f %s %.6f %.4f', newline='\n        ')
+    SITE_BLOCK = buf.getvalue().rstrip()
     
     inp = dict(NAME=fname, METHOD='clospackstack.py', SG='P1', SITE_BLOCK=SITE_BLOCK) 
     inp.update(zip(('lpa', 'lpb', 'lpc', 'lpal', 'lpbe', 'lpga'), Structure.latt.list))
@@ -565,8 +709,7 @@ def write_str(Structure, fname, debug=None):
     if debug is not None:  # optionally return str to console for debugging
         return rv
     
-    with open(abspath(fname) + '.str', 'w+') as f:
-        f.write(rv)
+    _dump(rv, fname, '.str')
         
     
     
@@ -97,30 +97,33 @@ for site in HMnIL.sites:
     site.occ = 0.0833
 
 # insert explicit void blocks
-void = Structure(sites=None, lattice=H)  
+void = Structure(sites=None, lattice=H.copy())  # own lattice, so setting void.c leaves H alone
 void.c = d001 - 7 * H.c # get approximate value of height assuming a 7.1 A d-spacing and 5 block period
 
+# structure-of-arrays payloads, computed once and shared by every symbol below
+LO, LMn, LOIL, LMnIL, Lvoid = (layer.arrays for layer in (HO, HMn, HOIL, HMnIL, void))
+
 # columns (fractional coordinates)
-A = np.array((0, 0, 1), dtype=float)
-B = np.array((-1/3, 0, 1), dtype=float)
-C = np.array((-2/3, 0, 1), dtype=float)
+A = (0., 0., 1.)
+B = (-1/3, 0., 1.)
+C = (-2/3, 0., 1.)
 
 #%% symtab setup
 # parse (e.g. AbCb‘A‘B‘c‘AcBc‘A‘B‘a‘CaBa‘C‘C‘b‘AbC...) using a symtable
 # need to substitute prime character for something safe in Python syntax
-symtab = {'A': (HO, A),
-          'B': (HO, B),
-          'C': (HO, C),
-          'a': (HMn, A),
-          'b': (HMn, B),
-          'c': (HMn, C),
-          'AIL': (HOIL, A),
-          'BIL': (HOIL, B),
-          'CIL': (HOIL, C),
-          'aIL': (HMnIL, A),
-          'bIL': (HMnIL, B),
-          'cIL': (HMnIL, C),
-          '\/' : (void, A)
+symtab = {'A': (LO, A),
+          'B': (LO, B),
+          'C': (LO, C),
+          'a': (LMn, A),
+          'b': (LMn, B),
+          'c': (LMn, C),
+          'AIL': (LOIL, A),
+          'BIL': (LOIL, B),
+          'CIL': (LOIL, C),
+          'aIL': (LMnIL, A),
+          'bIL': (LMnIL, B),
+          'cIL': (LMnIL, C),
+          '\/' : (Lvoid, A)
           }
 
 # actually, this isn't what we need at the moment.
@@ -150,10 +153,12 @@ fnames = list(( '1a_1H',
                 '7a_3H2'
                 ))
 
-# parse
+# parse symbols into integer indices of a (layer, vector) pool
+pool = list(symtab.values())
+tokens2id = {tok: i for i, tok in enumerate(symtab)}
 sequences = []
 for string in strings:
-    sequences.append([symtab[k] for k in string.split()])
+    sequences.append(np.array([tokens2id[k] for k in string.split()]))
 
 VImap = dict(zip(fnames, sequences))
 
@@ -161,8 +166,9 @@ VImap = dict(zip(fnames, sequences))
 for fname, seq in VImap.items():
     N = len(seq)  # subperiodic unit == periodic unit
     s = 'Drits_Birnessite_Polytypes\\vacancy\\hexagonal\\{}'.format(fname)
-    write_cif(build(seq, None, blockperiod=N, Nblocks=1), fname=s)
-    write_str(build(seq, None, blockperiod=N, Nblocks=1), fname=s)
+    rv = build(seq, None, blockperiod=N, Nblocks=1, pool=pool)
+    write_cif(rv, fname=s)
+    write_str(rv, fname=s)
 
 
 #%% containing tetrahedral ^{IV}TC sites (xIL XIL)
@@ -185,13 +191,15 @@ fnames = list(('3b_3R2',
 void.c = d001 - (1 * HMn.c) - (2 * HO.c) - (2 * HMnIL.c) - (2 * HOIL.c)
 IVvoid = void.copy()
 IVvoid.c = 1.925 - HMnIL.c
-symtab.update({'void': (void, A),
-               '-' : (IVvoid, A)
+symtab.update({'void': (Lvoid, A),
+               '-' : (IVvoid.arrays, A)
                })
-# parse
+# parse symbols into integer indices of a (layer, vector) pool
+pool = list(symtab.values())
+tokens2id = {tok: i for i, tok in enumerate(symtab)}
 sequences = []
 for string in strings:
-    sequences.append([symtab[k] for k in string.split()])
+    sequences.append(np.array([tokens2id[k] for k in string.split()]))
 
 IVmap = dict(zip(fnames, sequences))
 
@@ -199,8 +207,9 @@ IVmap = dict(zip(fnames, sequences))
 for fname, seq in IVmap.items():
     N = len(seq)  # subperiodic unit == periodic unit
     s = 'Drits_Birnessite_Polytypes\\vacancy\\hexagonal\\{}'.format(fname)
-    write_cif(build(seq, None, blockperiod=N, Nblocks=1), fname=s)
-    write_str(build(seq, None, blockperiod=N, Nblocks=1), fname=s)
+    rv = build(seq, None, blockperiod=N, Nblocks=1, pool=pool)
+    write_cif(rv, fname=s)
+    write_str(rv, fname=s)
 
 
 #%% containing intercalated species (Zn, e.g.) that aren't in the symtab
@@ -56,7 +56,9 @@ Created on Tue Apr  2 11:15:02 2019
 """
 
 import numpy as np
-from closepackstack import Lattice, Site, Structure, build, write_cif, write_str
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from closepackstack import Lattice, Site, Structure, build_many, write_cif, write_str
 
 #%% configure
 # lattice prms
@@ -80,128 +82,77 @@ HMn = Structure(sites=[Site('Mn', 1, 0, 0, 0, 1, H),
                 lattice=H
                 )
 
-OO, OMn = HO.copy(), HMn.copy()
-OO.latt = O
-OMn.latt = O
+OO = HO.with_lattice(O)
+OMn = HMn.with_lattice(O)
 
 blockperiod = 3  # number of HCP layers in a block
 
-# columns (fractional coordinates)
-A = np.array((0, 0, 1), dtype=float)
-B = np.array((-1/3, 0, 1), dtype=float)
-C = np.array((-2/3, 0, 1), dtype=float)
-
-# cyclic permutations of ABC  ( 3! = 6)
-Habc = np.array([(HO, A), (HMn, B), (HO, C)])
-Hbca = np.array([(HO, B), (HMn, C), (HO, A)])
-Hcab = np.array([(HO, C), (HMn, A), (HO, B)])
-Hcba = np.array([(HO, C), (HMn, B), (HO, A)])
-Hbac = np.array([(HO, B), (HMn, A), (HO, C)])
-Hacb = np.array([(HO, A), (HMn, C), (HO, B)])
-
-Oabc = np.array([(OO, A), (OMn, B), (OO, C)])
-Obca = np.array([(OO, B), (OMn, C), (OO, A)])
-Ocab = np.array([(OO, C), (OMn, A), (OO, B)])
-Ocba = np.array([(OO, C), (OMn, B), (OO, A)])
-Obac = np.array([(OO, B), (OMn, A), (OO, C)])
-Oacb = np.array([(OO, A), (OMn, C), (OO, B)])
-
-# interlayer vectors (absolute coordinates)
-d7 = np.array([(0, 0, 7.1 - 3 * lpc)])  # 7.1 angstrom d-spacing
-
-
-
-# ==================================  Hexagonal ========================================== #
-#%%     AbC – AbC ...                       1H                       1O
-#------------------------------------------------------------------------------
-N = 1
-sequence = Habc
-rv = build(sequence, interlayervectors=d7, blockperiod=blockperiod, Nblocks=N)
-write_cif(rv, r'Drits_Birnessite_Polytypes\pristine\hexagonal\1H.cif')
-
-
-#%%     AbC - CbA - AbC ...                 2H_1                     2O_1
-#------------------------------------------------------------------------------
-N = 2
-sequence = np.row_stack((Habc, Hcba))
-rv = build(sequence, interlayervectors=d7, blockperiod=blockperiod, Nblocks=N)
-write_cif(rv, r'Drits_Birnessite_Polytypes\pristine\hexagonal\2H1.cif')
-
-
-#%%     AbC – AcB – AbC ...                 2H_2                     2O_2
-#------------------------------------------------------------------------------
-N = 2
-sequence = np.row_stack((Habc, Hacb))
-rv = build(sequence, interlayervectors=d7, blockperiod=blockperiod, Nblocks=N)
-write_cif(rv, r'Drits_Birnessite_Polytypes\pristine\hexagonal\2H2.cif')
-
-
-#%%     AbC - CaB - BcA - AbC ...           3R_1                     1M_1
-#------------------------------------------------------------------------------
-N = 3
-sequence = np.row_stack((Habc, Hcab, Hbca))
-rv = build(sequence, interlayervectors=d7, blockperiod=blockperiod, Nblocks=N)
-s = r'Drits_Birnessite_Polytypes\pristine\hexagonal\3R1'
-write_cif(rv, s)
-write_str(rv, s)
-
-#%%     AbC – BcA – CaB – AbC ...           3R_2                     1M_2
-#------------------------------------------------------------------------------
-N = 3
-sequence = np.row_stack((Habc, Hbca, Hcab))
-rv = build(sequence, interlayervectors=d7, blockperiod=blockperiod, Nblocks=N)
-write_cif(rv, r'Drits_Birnessite_Polytypes\pristine\hexagonal\3R2.cif')
-
-
-#%%     AbC – AcB – AcB – AbC ...           3H_1                     3O_1
-#------------------------------------------------------------------------------
-N = 3
-sequence = np.row_stack((Habc, Hacb, Hacb))
-rv = build(sequence, interlayervectors=d7, blockperiod=blockperiod, Nblocks=N)
-write_cif(rv, r'Drits_Birnessite_Polytypes\pristine\hexagonal\3H1.cif')
-
-
-#%%     AbC – AcB – CaB – AbC ...           3H_2                     3O_2
-#------------------------------------------------------------------------------
-N = 3
-sequence = np.row_stack((Habc, Hacb, Hcab))
-rv = build(sequence, interlayervectors=d7, blockperiod=blockperiod, Nblocks=N)
-write_cif(rv, r'Drits_Birnessite_Polytypes\pristine\hexagonal\3H2.cif')
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+# columns (fractional coordinates), one contiguous table with rows A, B, C
+COLS = np.array([[0, 0, 1],
+                 [-1/3, 0, 1],
+                 [-2/3, 0, 1]], dtype=np.float64)
 
+# permutations of ABC  ( 3! = 6), as row indices into COLS
+PERMS = np.array([[0, 1, 2],   # abc
+                  [1, 2, 0],   # bca
+                  [2, 0, 1],   # cab
+                  [2, 1, 0],   # cba
+                  [1, 0, 2],   # bac
+                  [0, 2, 1]],  # acb
+                 dtype=np.int8)
+PERM_IDX = {name: idx for idx, name in enumerate(('abc', 'bca', 'cab', 'cba', 'bac', 'acb'))}
 
+# (O, Mn) layer types of hexagonal and orthogonal blocks
+Hlayers = (HO, HMn)
+Olayers = (OO, OMn)
 
 
+def block(layers, perm):
+    """ ((layer, column), ...) of an O-Mn-O block of layers == (O, Mn) stacked in columns perm (e.g. 'abc') """
+    return tuple((layers[i], COLS[col]) for i, col in zip((0, 1, 0), PERMS[PERM_IDX[perm]]))
 
 
+# (name, stacking sequence, Nblocks) of each polytype, built once
+POLYTYPES = [('1H',  block(Hlayers, 'abc'), 1),                                                   # AbC – AbC ...
+             ('2H1', block(Hlayers, 'abc') + block(Hlayers, 'cba'), 2),                           # AbC = CbA = AbC ...
+             ('2H2', block(Hlayers, 'abc') + block(Hlayers, 'acb'), 2),                           # AbC – AcB – AbC ...
+             ('3R1', block(Hlayers, 'abc') + block(Hlayers, 'cab') + block(Hlayers, 'bca'), 3),   # AbC = CaB = BcA = AbC ...
+             ('3R2', block(Hlayers, 'abc') + block(Hlayers, 'bca') + block(Hlayers, 'cab'), 3),   # AbC – BcA – CaB – AbC ...
+             ('3H1', block(Hlayers, 'abc') + block(Hlayers, 'acb') + block(Hlayers, 'acb'), 3),   # AbC – AcB – AcB – AbC ...
+             ('3H2', block(Hlayers, 'abc') + block(Hlayers, 'acb') + block(Hlayers, 'cab'), 3)    # AbC – AcB – CaB – AbC ...
+             ]
 
+# polytypes also written in TOPAS .str format
+STR_POLYTYPES = ('3R1',)
 
+# interlayer vectors (absolute coordinates)
+d7 = np.array([(0, 0, 7.1 - 3 * lpc)])  # 7.1 angstrom d-spacing
 
+# every polytype shares the interlayer vector and block period
+_build_many = partial(build_many, interlayervectors=d7, blockperiod=blockperiod)
 
 
 
+# ==================================  Hexagonal ========================================== #
+def write(rv, name):
+    """ write the files of one polytype; both writers relabel rv, so they run in sequence """
+    s = r'Drits_Birnessite_Polytypes\pristine\hexagonal\{}'.format(name)
+    write_cif(rv, s)
+    if name in STR_POLYTYPES:
+        write_str(rv, s)
 
 
+def main():
+    """ build all polytypes in one batch, sharing the layer payloads, and write their files """
+    names, sequences, Ns = zip(*POLYTYPES)
+    structures = _build_many(sequences, Nblocks=Ns)
 
+    # write files concurrently, one job per structure (no structure is touched by two threads)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(write, rv, name) for name, rv in zip(names, structures)]
+        for future in futures:  # re-raise any write error
+            future.result()
 
 
+if __name__ == "__main__":
+    main()
@@ -4,129 +4,182 @@ Created on Mon Apr  1 09:31:27 2019
 
 @author: pce
 """
-from closepackstack import Lattice, Site, Structure, build, write_cif, write_str
+from closepackstack import Lattice, Site, Structure, build, build_many, write_cif, write_str
 import numpy as np
+import pytest
 
 
-def test_lattice_value_propagation(structure):
+def check_lattice_value_propagation(structure):
     print('> Structure.c == Structure.Lattice.c:  ', structure.c == structure.latt.c)
     print('> Structure.c == Site.c:               ', structure.c == structure.sites[0].c)
     print('> Structure.c == Site.Lattice.c:       ', structure.c == structure.sites[0].latt.c)
     return structure.c == structure.sites[0].c == structure.sites[0].latt.c
 
 
-def test_lattice_instance_propagation(structure):
+def check_lattice_instance_propagation(structure):
     print('> Lattice pointer: ', hex(id(structure.latt)))
     return all([structure.latt is site.latt for site in structure.sites])
 
 
-#%% test lattice manipulation
-latt = Lattice(4.93, 2.85, 1.5, 90, 90, 90)
-
-# site instance
-site = Site('Mn', 1, 0, 0.1, 1/3, latt)
-site2 = site.copy()
-site2.specie = 'O'
-site2.z = 2/3
-
-# structure instance
-structure = Structure(sites=(site, site2), lattice=latt)
-test_lattice_value_propagation(structure)
-
-# change lattice
-structure.c = 2.5  # ; print (structure)
-test_lattice_value_propagation(structure)
-
-#%% test injecting sites into new lattice
 # vectors in *fractional units*
-f1 = np.array((0, 0, 1))
-f2 = np.array((-1/3, 0, 1))
-f3 = np.array((-2/3, 0, 1))
-
-# HCP layers
-lpb = 2.85
-lpc = 1
-
-Olatt= Lattice(np.sqrt(3) * lpb, lpb, lpc, 90, 90, 90)
-O1 = Site('O', 1, 0, 0, 0, Olatt)
-O2 = Site('O', 1, 1/2, 1/2, 0, Olatt)
-OL  = Structure(sites=(O1, O2), lattice=Olatt)
-
-Mnlatt = Olatt.copy()
-Mn1 = Site('Mn', 1, 0, 0, 0, Mnlatt)
-Mn2 = Site('Mn', 1, 1/2, 1/2, 0, Mnlatt)
-MnL = Structure(sites=(Mn1, Mn2), lattice=Olatt)
-
-# 1H test case with space
-interlayervectors = [np.array((0.0, 0.0, 5.0))]
-sequence = [(OL,  f1), #  * OL.abc),
-            (MnL, f2), # * MnL.abc),
-            (OL,  f3)  # * OL.abc) 
-            ]
+f1 = (0., 0., 1.)
+f2 = (-1/3, 0., 1.)
+f3 = (-2/3, 0., 1.)
+
 blockperiod = int(3)  # block period
 Nblocks = int(5)  # number of blocks in periodic stack
 
-supstr= build(sequence=sequence, interlayervectors=interlayervectors,
-              blockperiod=blockperiod, Nblocks=Nblocks)
-
-test_lattice_instance_propagation(supstr)
-
-
-#%% writing results
-cifstr = write_cif(supstr, 'test.cif', debug=True)
-print(cifstr)
-cifstr = write_cif(supstr, 'test.cif', debug=None)
-
-
-#%% writing results
-strstr = write_str(supstr, 'test.str', debug=True)
-print(strstr)
-strstr = write_str(supstr, 'test.str', debug=None)
-
-
-#%% test case with laterally shifted origin
-interlayervectors = [np.array((0., 0., 5.)),  # Fat!
-                     np.array((1/3, 0., 2.5)) # skinny!
-                     ]
-
-
-supstr2 = build(sequence=sequence, interlayervectors=interlayervectors,
-                blockperiod=blockperiod, Nblocks=Nblocks)
-
-cifstr = write_cif(supstr2, 'test.cif', debug=True)
-print(cifstr)
-cifstr = write_cif(supstr2, 'test.cif', debug=None)
 
+def hcp_sequence():
+    """ O-Mn-O block of HCP layers as ((layer, vector), ...) """
+    lpb = 2.85
+    lpc = 1
 
+    Olatt= Lattice(np.sqrt(3) * lpb, lpb, lpc, 90, 90, 90)
+    O1 = Site('O', 1, 0, 0, 0, 1, Olatt)
+    O2 = Site('O', 1, 1/2, 1/2, 0, 1, Olatt)
+    OL  = Structure(sites=(O1, O2), lattice=Olatt)
 
-#%% test case with density wave
-zint = 1 + 7.5 * np.sin(np.linspace(0, np.pi, 20))
-x = zint
-y = np.zeros_like(zint)
-interlayervectors = np.column_stack((x, y, zint))
+    Mnlatt = Olatt.copy()
+    Mn1 = Site('Mn', 1, 0, 0, 0, 1, Mnlatt)
+    Mn2 = Site('Mn', 1, 1/2, 1/2, 0, 1, Mnlatt)
+    MnL = Structure(sites=(Mn1, Mn2), lattice=Olatt)
 
-blockperiod = 3  # non-defective birnessite
-Nblocks = int(20) # period of density wave
+    return [(OL,  f1),
+            (MnL, f2),
+            (OL,  f3)
+            ]
 
-supstr3 = build(sequence=sequence, interlayervectors=interlayervectors,
-                blockperiod=blockperiod, Nblocks=Nblocks)
 
-cifstr = write_cif(supstr3, 'test.cif', debug=True)
-print(cifstr)
-cifstr = write_cif(supstr3, 'test.cif', debug=None)
+def build_1H(interlayervectors=None, Nblocks=Nblocks):
+    """ 1H test case with space """
+    if interlayervectors is None:
+        interlayervectors = [np.array((0.0, 0.0, 5.0))]
+    return build(sequence=hcp_sequence(), interlayervectors=interlayervectors,
+                 blockperiod=blockperiod, Nblocks=Nblocks)
 
 
+#%% test lattice manipulation
+def test_lattice_manipulation():
+    latt = Lattice(4.93, 2.85, 1.5, 90, 90, 90)
 
+    # site instance
+    site = Site('Mn', 1, 0, 0.1, 1/3, 1, latt)
+    site2 = site.copy()
+    site2.specie = 'O'
+    site2.z = 2/3
 
+    # structure instance
+    structure = Structure(sites=(site, site2), lattice=latt)
+    assert check_lattice_value_propagation(structure)
 
+    # change lattice
+    structure.c = 2.5
+    assert check_lattice_value_propagation(structure)
+    assert np.isclose(site2.fz, 2/3 / 1.5)
 
 
+#%% test injecting sites into new lattice
+def test_lattice_instance_propagation():
+    supstr = build_1H()
+    assert check_lattice_instance_propagation(supstr)
+    assert len(supstr) == 2 * blockperiod * Nblocks
+    assert np.isclose(supstr.c, (blockperiod + 5.) * Nblocks)  # gap follows every block
 
 
+#%% writing results
+def test_write_cif(tmp_path):
+    supstr = build_1H()
+    cifstr = write_cif(supstr, str(tmp_path / 'test'), debug=True)
+    assert cifstr.count('\n') > len(supstr)
+    write_cif(supstr, str(tmp_path / 'test'), debug=None)
+    with open(tmp_path / 'test.cif') as f:
+        assert f.read() == cifstr
 
 
+def test_write_str(tmp_path):
+    supstr = build_1H()
+    strstr = write_str(supstr, str(tmp_path / 'test'), debug=True)
+    assert 'O1' in strstr and 'Mn1' in strstr
+    write_str(supstr, str(tmp_path / 'test'), debug=None)
+    with open(tmp_path / 'test.str') as f:
+        assert f.read() == strstr
 
 
+#%% test case with laterally shifted origin
+def test_lateral_shift(tmp_path):
+    interlayervectors = [np.array((0., 0., 5.)),  # Fat!
+                         np.array((1/3, 0., 2.5)) # skinny!
+                         ]
+    supstr2 = build_1H(interlayervectors)
 
+    fxyz = supstr2.arrays.frac
+    assert np.all((fxyz[:, :2] >= 0) & (fxyz[:, :2] < 1))
+    write_cif(supstr2, str(tmp_path / 'test'), debug=None)
 
 
+#%% test case with density wave
+def test_density_wave(tmp_path):
+    n = 20
+    interlayervectors = np.empty((n, 3))
+    zint = interlayervectors[:, 2]
+    np.sin(np.linspace(0, np.pi, n), out=zint)
+    zint *= 7.5
+    zint += 1.
+    interlayervectors[:, 0] = zint
+    interlayervectors[:, 1] = 0.
+
+    Nblocks = int(20) # period of density wave
+    supstr3 = build_1H(interlayervectors, Nblocks=Nblocks)
+
+    assert len(supstr3) == 2 * blockperiod * Nblocks
+    write_cif(supstr3, str(tmp_path / 'test'), debug=None)
+
+
+#%% test building from integer indices into a pool
+def test_build_pool():
+    pool = hcp_sequence()
+    ids = [0, 1, 2, 2, 1, 0]  # e.g. a parsed sequence of symbols
+    interlayervectors = [(0., 0., 5.)]
+    indexed = build(ids, interlayervectors, blockperiod, Nblocks, pool=pool)
+    listed = build([pool[i] for i in ids], interlayervectors, blockperiod, Nblocks)
+
+    assert np.allclose(indexed.arrays.frac, listed.arrays.frac)
+    assert list(indexed.arrays.species) == list(listed.arrays.species)
+    assert np.isclose(indexed.c, listed.c)
+
+#%% test building a batch of supercells sharing layers
+def test_build_many():
+    O, Mn, _ = hcp_sequence()
+    seqs = [[O, Mn, O],
+            [O, Mn, O, (O[0], f2), (Mn[0], f1), (O[0], f3)]]
+    Ns = [2, 3]
+    interlayervectors = [(0., 0., 5.)]
+    batch = build_many(seqs, interlayervectors, blockperiod, Ns)
+
+    assert len(batch) == len(seqs)
+    for supstr, seq, N in zip(batch, seqs, Ns):
+        single = build(seq, interlayervectors, blockperiod, N)
+        assert np.allclose(supstr.arrays.frac, single.arrays.frac)
+        assert np.isclose(supstr.c, single.c)
+
+#%% test rebinding a layer to a new lattice
+def test_with_lattice():
+    layer = hcp_sequence()[0][0]
+    old = layer.latt
+    lattice = Lattice(2.85, 2.85, 1, 90, 90, 120)
+    w = layer.with_lattice(lattice)
+
+    assert w.latt is lattice
+    assert layer.latt is old
+    assert all(site.latt is old for site in layer.sites)
+    assert np.allclose(w.arrays.frac, layer.arrays.frac)
+    assert list(w.arrays.species) == list(layer.arrays.species)
+
+#%% malformed vectors
+def test_malformed_vectors():
+    with pytest.raises(ValueError):
+        build_1H([(0., 5.), (0., 2.5), (0., 1.)])  # 2-component interlayer vectors
+    sequence = [(layer, vector[::2]) for layer, vector in hcp_sequence()]  # (x, z) column vectors
+    with pytest.raises(ValueError):
+        build(sequence, None, blockperiod, Nblocks)